@@ -1,9 +1,11 @@
+import asyncio
 import json
 import os
+import orjson
 from typing import List, Dict, Optional
 from datetime import datetime
 from pathlib import Path
-from models import Product, NegotiationSession
+from models import Product, NegotiationSession, ChatMessage
 
 
 class JSONDatabase:
@@ -14,7 +16,17 @@ class JSONDatabase:
             data_dir = backend_dir.parent / "data"
         self.data_dir = Path(data_dir)
         self.products_file = self.data_dir / "products.json"
-        self.sessions_file = self.data_dir / "sessions.json"
+        self.sessions_file = self.data_dir / "sessions.json"  # Legacy single-file session store
+        # Per-session storage: <id>.meta.json for metadata, <id>.jsonl with one message per line
+        self.sessions_dir = self.data_dir / "sessions"
+        
+        # Products by id, loaded on first lookup and kept in sync by save_product
+        self._product_cache: Optional[Dict[str, Product]] = None
+        
+        # Sessions changed since the last write, persisted together by the flush loop
+        self.flush_interval = 0.5
+        self._dirty: Dict[str, NegotiationSession] = {}
+        self._flush_task: Optional[asyncio.Task] = None
         
     async def initialize(self):
         """Initialize database with predefined data"""
@@ -28,6 +40,8 @@ class JSONDatabase:
         # Initialize sessions file if it doesn't exist
         if not self.sessions_file.exists():
             await self._create_initial_sessions()
+        
+        self.sessions_dir.mkdir(exist_ok=True)
     
     async def _create_initial_products(self):
         """Create initial predefined products"""
@@ -241,6 +255,9 @@ class JSONDatabase:
             with open(self.products_file, 'w', encoding='utf-8') as f:
                 json.dump(products_data, f, indent=2, ensure_ascii=False)
             
+            if self._product_cache is not None:
+                self._product_cache[product.id] = product
+            
             return True
             
         except Exception as e:
@@ -249,60 +266,111 @@ class JSONDatabase:
     
     async def get_product(self, product_id: str) -> Optional[Product]:
         """Get specific product by ID"""
-        products = await self.get_products()
-        for product in products:
-            if product.id == product_id:
-                return product
-        return None
+        if self._product_cache is None:
+            self._product_cache = {product.id: product for product in await self.get_products()}
+        return self._product_cache.get(product_id)
+    
+    def _session_meta_path(self, session_id: str) -> Path:
+        return self.sessions_dir / f"{session_id}.meta.json"
+    
+    def _session_log_path(self, session_id: str) -> Path:
+        return self.sessions_dir / f"{session_id}.jsonl"
+    
+    def mark_dirty(self, session: NegotiationSession):
+        """Queue a session's metadata for the next batched write"""
+        self._dirty[session.id] = session
+    
+    def start_flush_loop(self):
+        """Start the background task that persists dirty sessions"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    async def stop_flush_loop(self):
+        """Stop the background flush task and persist anything still pending"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+    
+    async def _flush_loop(self):
+        """Persist dirty sessions every flush interval"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._dirty:
+                await self.flush()
+    
+    async def flush(self, session_id: Optional[str] = None):
+        """Write pending metadata for one session, or all dirty sessions"""
+        if session_id is None:
+            sessions = list(self._dirty.values())
+            self._dirty.clear()
+        else:
+            session = self._dirty.pop(session_id, None)
+            sessions = [session] if session else []
+        
+        for session in sessions:
+            self._write_session_meta(session)
+    
+    async def append_message(self, message: ChatMessage):
+        """Append a single message to its session log"""
+        try:
+            with open(self._session_log_path(message.session_id), 'ab') as f:
+                f.write(orjson.dumps(message.to_dict()) + b"\n")
+        except Exception as e:
+            print(f"Error appending message: {e}")
     
     async def save_session(self, session: NegotiationSession):
-        """Save negotiation session"""
+        """Save a full snapshot of a negotiation session (metadata and message log)"""
+        self._dirty.pop(session.id, None)
         try:
-            # Load existing sessions
-            sessions_data = []
-            if self.sessions_file.exists():
-                try:
-                    with open(self.sessions_file, 'r', encoding='utf-8') as f:
-                        content = f.read().strip()
-                        if content:  # Only parse if file has content
-                            sessions_data = json.loads(content)
-                        else:
-                            sessions_data = []
-                except (json.JSONDecodeError, ValueError) as e:
-                    print(f"Warning: Could not load sessions file, starting fresh: {e}")
-                    sessions_data = []
-            
-            # Convert session to dict and handle datetime serialization
-            session_dict = session.dict()
-            session_dict['created_at'] = session.created_at.isoformat()
-            if session.ended_at:
-                session_dict['ended_at'] = session.ended_at.isoformat()
-            
-            # Convert message timestamps
-            for message in session_dict['messages']:
-                if isinstance(message['timestamp'], datetime):
-                    message['timestamp'] = message['timestamp'].isoformat()
-            
-            # Update or add session
-            session_exists = False
-            for i, existing_session in enumerate(sessions_data):
-                if existing_session['id'] == session.id:
-                    sessions_data[i] = session_dict
-                    session_exists = True
-                    break
-            
-            if not session_exists:
-                sessions_data.append(session_dict)
-            
-            # Save to file
-            with open(self.sessions_file, 'w', encoding='utf-8') as f:
-                json.dump(sessions_data, f, indent=2, ensure_ascii=False)
-                
+            self._write_session_meta(session)
+            with open(self._session_log_path(session.id), 'wb') as f:
+                f.write(b"".join(orjson.dumps(message.to_dict()) + b"\n" for message in session.messages))
         except Exception as e:
             print(f"Error saving session: {e}")
     
+    def _write_session_meta(self, session: NegotiationSession):
+        """Write session metadata without its messages"""
+        try:
+            with open(self._session_meta_path(session.id), 'wb') as f:
+                f.write(orjson.dumps(session.model_dump(exclude={'messages'}), option=orjson.OPT_INDENT_2))
+        except Exception as e:
+            print(f"Error saving session metadata: {e}")
+    
     async def get_session(self, session_id: str) -> Optional[NegotiationSession]:
         """Get specific session by ID"""
+        if session_id in self._dirty:
+            return self._dirty[session_id]
+        
+        meta_path = self._session_meta_path(session_id)
+        if not meta_path.exists():
+            return await self._get_legacy_session(session_id)
+        
+        try:
+            with open(meta_path, 'rb') as f:
+                session_data = orjson.loads(f.read())
+            
+            # Rebuild the message list by streaming the session log
+            messages = []
+            log_path = self._session_log_path(session_id)
+            if log_path.exists():
+                with open(log_path, 'rb') as f:
+                    for line in f:
+                        if line.strip():
+                            messages.append(orjson.loads(line))
+            
+            session_data['messages'] = messages
+            return NegotiationSession(**session_data)
+        except Exception as e:
+            print(f"Error loading session: {e}")
+            return None
+    
+    async def _get_legacy_session(self, session_id: str) -> Optional[NegotiationSession]:
+        """Get a session stored in the legacy sessions.json file"""
         try:
             if not self.sessions_file.exists():
                 return None
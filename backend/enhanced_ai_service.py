@@ -173,8 +173,8 @@ class EnhancedAIService:
                     chat_history_dicts = []
                     for msg in context.chat_history:
                         try:
-                            if hasattr(msg, 'dict'):
-                                msg_dict = msg.dict()
+                            if hasattr(msg, 'to_dict'):
+                                msg_dict = msg.to_dict()
                                 # Ensure datetime objects are converted to strings
                                 if 'timestamp' in msg_dict and hasattr(msg_dict['timestamp'], 'isoformat'):
                                     msg_dict['timestamp'] = msg_dict['timestamp'].isoformat()
@@ -38,22 +38,311 @@ Each response is dynamically selected based on:
 """
 
 import google.generativeai as genai
+from google.api_core.exceptions import ResourceExhausted
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+import contextlib
 import os
 import random
-from typing import List, Optional, Dict, Any
-from models import ChatMessage, Product, NegotiationApproach
+import re
+import sys
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple, Final
+from models import ChatMessage, Product, NegotiationApproach, NegotiationSession
 from negotiation_engine import NegotiationTactic, NegotiationPhase
+from semantic_cache import SemanticCache, SEMANTIC_CACHE_AVAILABLE
 import json
 import asyncio
 import logging
+import time
+from datetime import timedelta
+
+try:
+    from aiolimiter import AsyncLimiter
+    RATE_LIMITER_AVAILABLE = True
+except ImportError:
+    RATE_LIMITER_AVAILABLE = False
+    logging.warning("aiolimiter not available, Gemini requests-per-minute limit disabled")
 
 logger = logging.getLogger(__name__)
 
+# Approach strategies used in the negotiation prompt
+APPROACH_STRATEGIES: Final[Dict[NegotiationApproach, Dict[str, str]]] = {
+    NegotiationApproach.ASSERTIVE: {
+        "style": "direct and confident",
+        "tactics": "Make firm offers, emphasize market research, be persistent but polite",
+        "personality": "business-like and decisive"
+    },
+    NegotiationApproach.DIPLOMATIC: {
+        "style": "balanced and respectful",
+        "tactics": "Find mutual benefits, acknowledge seller's position, propose win-win solutions",
+        "personality": "professional and understanding"
+    },
+    NegotiationApproach.CONSIDERATE: {
+        "style": "empathetic and budget-conscious",
+        "tactics": "Explain budget constraints, show genuine interest, be patient",
+        "personality": "humble and appreciative"
+    }
+}
+
+# Prompt guidance for each strategic tactic
+TACTIC_DESCRIPTIONS: Final[Dict[NegotiationTactic, str]] = {
+    NegotiationTactic.ANCHORING: "Anchor with market research and comparable prices",
+    NegotiationTactic.SCARCITY: "Mention time constraints or alternative options",
+    NegotiationTactic.BUNDLING: "Request additional value (accessories, delivery, warranty)",
+    NegotiationTactic.RECIPROCITY: "Show appreciation for seller's flexibility and respond in kind",
+    NegotiationTactic.SOCIAL_PROOF: "Reference what others are paying for similar items",
+    NegotiationTactic.URGENCY: "Express time sensitivity or immediate purchase capability",
+    NegotiationTactic.AUTHORITY: "Reference expert advice or professional recommendations",
+    NegotiationTactic.COMMITMENT: "Show readiness to close the deal immediately"
+}
+
+# Session-invariant part of the negotiation prompt
+PROMPT_PREFIX_TEMPLATE: Final[str] = """
+You are an AI negotiation agent representing a buyer who wants to purchase: {title}
+
+PRODUCT DETAILS:
+- Current asking price: ₹{price:,}
+- Your target price: ₹{target_price:,}
+- Your maximum budget: ₹{max_budget:,}
+- Product condition: {condition}
+- Seller: {seller_name}
+- Location: {location}
+
+NEGOTIATION APPROACH: {approach_label}
+- Style: {style}
+- Tactics: {tactics}
+- Personality: {personality}
+
+INSTRUCTIONS:
+1. Respond as a human buyer (never mention you're an AI)
+2. Use the {approach} negotiation approach consistently
+3. Stay within your budget constraints (max ₹{max_budget:,})
+4. Work towards your target price of ₹{target_price:,}
+5. Keep responses conversational and natural (50-80 words)
+6. Include relevant details about pickup/payment when appropriate
+7. Be respectful but persistent in negotiations
+8. If the seller's price is too high, explain your position clearly
+9. If a good deal is reached, move towards closing (exchange contact details)
+
+CURRENT SITUATION ANALYSIS:
+- Current offer/price being discussed: Look at the conversation
+- Progress towards target: Calculate if you're getting closer
+- Seller's flexibility: Assess from their responses
+"""
+
+# Per-turn part of the negotiation prompt
+PROMPT_SUFFIX_TEMPLATE: Final[str] = """
+{prior_summary}CONVERSATION HISTORY:
+{conversation_history}
+
+LATEST SELLER MESSAGE: "{last_seller_message}"
+
+Generate your next response as the buyer:
+"""
+
+# Number of recent messages included verbatim in the prompt
+PROMPT_HISTORY_MESSAGES: Final[int] = 6
+
+# Messages always kept verbatim; older ones are folded into the session's rolling summary
+SUMMARY_KEEP_RECENT_MESSAGES: Final[int] = 2
+
+# Refresh the rolling summary once more than this many messages sit outside it, i.e. before they overflow the window
+SUMMARY_REFRESH_MESSAGES: Final[int] = PROMPT_HISTORY_MESSAGES - 1
+
+# Hard cap on verbatim messages while a summary refresh is pending or failing
+PROMPT_MAX_HISTORY_MESSAGES: Final[int] = 2 * PROMPT_HISTORY_MESSAGES
+
+HISTORY_SUMMARY_PROMPT: Final[str] = """
+Summarize this marketplace negotiation between a buyer and a seller in under 40 words.
+Keep every price offered, agreed terms and open questions. Reply with the summary only.
+
+PREVIOUS SUMMARY: {previous_summary}
+
+NEW MESSAGES:
+{conversation}
+"""
+
+# Keyword categories for the simplified fallback responses, in match priority order
+FALLBACK_KEYWORDS = {
+    'price_low': ['low', 'too low', 'very low', 'not enough', 'insufficient', 'can\'t accept', 'won\'t work', 'no', 'cannot', 'firm', 'minimum'],
+    'agreeable': ['ok', 'okay', 'fine', 'alright', 'sounds good', 'agreed', 'deal', 'accept', 'yes'],
+    'greeting': ['hi', 'hello', 'hey', 'good morning', 'good afternoon', 'available'],
+    'price': ['price', 'cost', 'amount', 'offer', 'budget'],
+    'logistics': ['meet', 'pickup', 'delivery', 'when', 'where', 'payment']
+}
+
+# One compiled alternation per category, so each category is a single C-level scan
+FALLBACK_KEYWORD_PATTERNS = [
+    (category, re.compile("|".join(re.escape(keyword) for keyword in keywords)))
+    for category, keywords in FALLBACK_KEYWORDS.items()
+]
+
+# Response templates per (category, approach); only the chosen template is formatted
+FALLBACK_RESPONSE_TABLE = {
+    ('price_low', NegotiationApproach.ASSERTIVE): [
+        "I understand, but ₹{target_price:,} is based on market research. Let me stretch to ₹{stretch_price:,} maximum.",
+        "Based on similar listings, ₹{target_price:,} is competitive. I can go up to ₹{stretch_price:,} if needed.",
+        "Market data supports ₹{target_price:,}. My absolute maximum would be ₹{stretch_price:,}."
+    ],
+    ('price_low', NegotiationApproach.DIPLOMATIC): [
+        "I appreciate your position. Could we perhaps meet at ₹{stretch_price:,}? That would work for both of us.",
+        "Let's find middle ground. Would ₹{stretch_price:,} be more acceptable?",
+        "I understand your concern. Could ₹{stretch_price:,} bridge the gap between us?"
+    ],
+    ('price_low', NegotiationApproach.CONSIDERATE): [
+        "I really want this item. Could you please consider ₹{stretch_price:,}? It would mean a lot to me.",
+        "I understand it might seem low. ₹{stretch_price:,} is really stretching my budget.",
+        "Please help me out. ₹{stretch_price:,} would be perfect if you could consider it."
+    ],
+    ('agreeable', NegotiationApproach.ASSERTIVE): [
+        "Excellent! Let's finalize this deal. When can we arrange pickup?",
+        "Perfect! I'm ready to proceed. How should we handle payment?",
+        "Great decision! Let's exchange contact details and complete this transaction."
+    ],
+    ('agreeable', NegotiationApproach.DIPLOMATIC): [
+        "Wonderful! I'm glad we could reach an agreement. How would you like to proceed?",
+        "That's fantastic! Thank you for being flexible. What's the next step?",
+        "Excellent! I appreciate your cooperation. Shall we arrange the pickup details?"
+    ],
+    ('agreeable', NegotiationApproach.CONSIDERATE): [
+        "Thank you so much! This really means a lot to me. How can we arrange the pickup?",
+        "I'm so grateful we could work this out! When would be convenient for you?",
+        "Thank you for understanding! I really appreciate your flexibility."
+    ],
+    ('greeting', NegotiationApproach.ASSERTIVE): [
+        "Hello {seller_name}! Yes, I'm very interested. I can offer ₹{target_price:,} for immediate purchase.",
+        "Hi there! I'm interested in your {title}. ₹{target_price:,} would work for me."
+    ],
+    ('greeting', NegotiationApproach.DIPLOMATIC): [
+        "Hello {seller_name}! Yes, I'm interested in your listing. Would ₹{target_price:,} work for you?",
+        "Hi! Your {title} looks great. Could we discuss ₹{target_price:,}?"
+    ],
+    ('greeting', NegotiationApproach.CONSIDERATE): [
+        "Hello {seller_name}! Yes, I'm interested. I hope ₹{target_price:,} might work?",
+        "Hi! I really love your {title}. Could ₹{target_price:,} be possible?"
+    ],
+    ('price', NegotiationApproach.ASSERTIVE): [
+        "Based on market research, ₹{target_price:,} is what I can offer. It's competitive and fair.",
+        "I've analyzed similar items - ₹{target_price:,} is a solid market price."
+    ],
+    ('price', NegotiationApproach.DIPLOMATIC): [
+        "I've been looking at similar items, and ₹{target_price:,} seems reasonable. What do you think?",
+        "Based on my research, ₹{target_price:,} appears fair for both of us."
+    ],
+    ('price', NegotiationApproach.CONSIDERATE): [
+        "I understand the value, but my budget is limited to ₹{target_price:,}. Is there any flexibility?",
+        "₹{target_price:,} is really what I can afford. I hope that might work?"
+    ],
+    ('logistics', NegotiationApproach.ASSERTIVE): [
+        "Perfect! I'm flexible with timing. I can arrange pickup today or tomorrow. Cash or online transfer?",
+        "Excellent! I can come whenever convenient for you. What payment method do you prefer?"
+    ],
+    ('logistics', NegotiationApproach.DIPLOMATIC): [
+        "Great! I'm available most times. When would work best for you? I can do cash or digital payment.",
+        "Wonderful! I'm flexible with both timing and payment method. What works for you?"
+    ],
+    ('logistics', NegotiationApproach.CONSIDERATE): [
+        "Thank you! I can work around your schedule. Whatever time and payment method you prefer.",
+        "I appreciate it! I'm very flexible with pickup time and can pay however you'd like."
+    ],
+    # Default fallback response when no keywords match
+    ('default', NegotiationApproach.ASSERTIVE): [
+        "Based on my research, ₹{target_price:,} is a fair market price for this item.",
+        "I'm prepared to offer ₹{target_price:,} which aligns with current market values."
+    ],
+    ('default', NegotiationApproach.DIPLOMATIC): [
+        "I'm hoping we can find a price that works for both of us, around ₹{target_price:,}.",
+        "Could we explore ₹{target_price:,} as a fair solution?"
+    ],
+    ('default', NegotiationApproach.CONSIDERATE): [
+        "I really hope we can work something out around ₹{target_price:,}.",
+        "₹{target_price:,} would really fit my budget perfectly. I hope that might work?"
+    ]
+}
+
+
+# Whole-message closing replies answered with a canned reply, without a Gemini round-trip
+CLOSING_MESSAGE_PATTERN = re.compile(
+    r"^(?:(?:ok|okay|alright|great|sure|yes|fine)\s+)*"
+    r"(?:deal|it'?s a deal|done deal|agreed|deal agreed|i accept your offer|accepted|let'?s do it|lets do it)"
+    r"(?:\s+(?:then|done))?$"
+)
+
+# Pickup phrases that may appear anywhere in an otherwise plain logistics question
+LOGISTICS_PHRASE_PATTERN = re.compile(r"\b(?:pickup|pick up|pick it up|collect it)\b")
+
+# Numbers, price words, objections or conditions mean the seller is still negotiating, so Gemini must answer
+SHORT_CIRCUIT_BLOCKER_PATTERN = re.compile(
+    r"\d|₹|\b(?:price|cost|amount|budget|rs|rupees|inr|hundred|thousand|lakh|k|"
+    r"no|not|cannot|can't|won't|firm|final|minimum|best|if|only|but|unless|provided|except)\b"
+)
+
+
+def _match_short_circuit_intent(message: str) -> Optional[str]:
+    """Return the category of an unambiguous closing/logistics message that needs no LLM call"""
+    message_lower = message.lower()
+    if SHORT_CIRCUIT_BLOCKER_PATTERN.search(message_lower):
+        return None
+    
+    # Closing only when the whole message is the closing phrase, so "such a deal" or "deal with it" don't count
+    normalized = " ".join(re.sub(r"[^\w\s']", " ", message_lower.replace("’", "'")).split())
+    if CLOSING_MESSAGE_PATTERN.match(normalized):
+        return 'agreeable'
+    if LOGISTICS_PHRASE_PATTERN.search(message_lower):
+        return 'logistics'
+    return None
+
+
+# Prices and amounts; text quoting them depends on negotiation state and is never cached or served from cache
+PRICE_FIGURE_PATTERN = re.compile(r"\d|₹")
+
+
+def _match_fallback_category(message: str) -> Optional[str]:
+    """Return the highest-priority keyword category found in the message"""
+    message_lower = message.lower()
+    for category, pattern in FALLBACK_KEYWORD_PATTERNS:
+        if pattern.search(message_lower):
+            return category
+    return None
+
+
 class GeminiOnlyService:
     """Gemini-only AI service for negotiation responses"""
     
     def __init__(self):
         self.api_key = os.getenv("GEMINI_API_KEY")
+        self.model_name = os.getenv("GEMINI_MODEL", "gemini-pro")
+        self.cache_ttl_minutes = int(os.getenv("GEMINI_CACHE_TTL_MINUTES", "60"))
+        # Gemini refuses context caches below this many tokens
+        self.cache_min_tokens = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "32768"))
+        # Background context-cache creation per session, and when each session last built a prompt
+        self.cache_tasks: Dict[str, asyncio.Task] = {}
+        self.session_last_used: Dict[str, float] = {}
+        self.cleanup_tasks: set = set()
+        # Server-side Gemini context caches holding each session's static prompt prefix
+        self.session_caches: Dict[str, Any] = {}
+        # Models bound to each session's context cache, built once per session
+        self.session_models: Dict[str, Any] = {}
+        # When each context cache expires on Gemini's side; the TTL counts from creation, not last use
+        self.session_cache_deadlines: Dict[str, float] = {}
+        # Formatted prompt prefix per session, reused when no context cache is available
+        self.session_prefixes: Dict[str, str] = {}
+        # Responses reused for near-identical seller messages in the same negotiation context
+        cache_enabled = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+        self.semantic_cache = (
+            SemanticCache(max_entries_per_key=int(os.getenv("CACHE_MAX_SIZE", "1000")))
+            if cache_enabled and SEMANTIC_CACHE_AVAILABLE else None
+        )
+        self.semantic_cache_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        # Bound in-flight Gemini calls and requests per minute to stay inside the provider quota
+        self._sem = asyncio.Semaphore(int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")))
+        requests_per_minute = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+        self._bucket = (
+            AsyncLimiter(max_rate=requests_per_minute, time_period=60)
+            if RATE_LIMITER_AVAILABLE else contextlib.nullcontext()
+        )
+        self.max_retries = int(os.getenv("AI_MAX_RETRIES", "3"))
+        # Background history summarization, at most one per session
+        self.summary_tasks: Dict[str, asyncio.Task] = {}
         if not self.api_key or self.api_key == "your_gemini_api_key_here":
             logger.warning("WARNING: GEMINI_API_KEY not configured. Using fallback responses only.")
             self.model = None
@@ -64,7 +353,7 @@ class GeminiOnlyService:
         """Setup Gemini AI client"""
         try:
             genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-pro')
+            self.model = genai.GenerativeModel(self.model_name)
             logger.info("INFO: Gemini AI service initialized successfully")
         except Exception as e:
             logger.error(f"ERROR: Failed to initialize Gemini AI: {e}")
@@ -97,13 +386,165 @@ class GeminiOnlyService:
             logger.error(f"Error generating strategic AI response: {e}")
             return self._get_enhanced_fallback_response(session_data, seller_message, tactics, decision, product)
     
+    def create_session_cache(
+        self,
+        session_id: str,
+        product: Product,
+        approach,  # Can be string or NegotiationApproach enum
+        target_price: int,
+        max_budget: int
+    ):
+        """Store a session's static prompt prefix and, when it is large enough, cache it with Gemini in the background"""
+        
+        # Convert string to enum if needed
+        if isinstance(approach, str):
+            try:
+                approach = NegotiationApproach(approach.lower())
+            except ValueError:
+                approach = NegotiationApproach.DIPLOMATIC  # Default fallback
+        
+        self._expire_idle_sessions()
+        
+        prefix = sys.intern(self._build_prompt_prefix(approach, target_price, max_budget, product))
+        self.session_prefixes[session_id] = prefix
+        self.session_last_used[session_id] = time.monotonic()
+        
+        # A token spans at least one character, so shorter prefixes can never reach the minimum
+        if not self.model or len(prefix) < self.cache_min_tokens:
+            return
+        
+        task = asyncio.create_task(self._create_context_cache(session_id, prefix))
+        self.cache_tasks[session_id] = task
+        task.add_done_callback(lambda _: self.cache_tasks.pop(session_id, None))
+    
+    async def _create_context_cache(self, session_id: str, prefix: str):
+        """Create the Gemini context cache for a session prefix, off the request path"""
+        
+        try:
+            token_count = await self.model.count_tokens_async(prefix)
+            if token_count.total_tokens < self.cache_min_tokens:
+                logger.info(f"Prompt prefix of session {session_id} too small for Gemini context caching")
+                return
+            
+            loop = asyncio.get_event_loop()
+            cached_content = await loop.run_in_executor(
+                None,
+                lambda: genai.caching.CachedContent.create(
+                    model=self.model.model_name,
+                    system_instruction=prefix,
+                    ttl=timedelta(minutes=self.cache_ttl_minutes)
+                )
+            )
+            self.session_caches[session_id] = cached_content
+            self.session_models[session_id] = genai.GenerativeModel.from_cached_content(
+                cached_content=cached_content
+            )
+            # Stop using the cache a minute early so no request races its expiry
+            self.session_cache_deadlines[session_id] = time.monotonic() + self.cache_ttl_minutes * 60 - 60
+            logger.info(f"INFO: Created Gemini context cache for session {session_id}")
+            
+        except Exception as e:
+            logger.warning(f"Could not create Gemini context cache for session {session_id}: {e}")
+    
+    def _forget_session(self, session_id: str):
+        """Drop all per-session state, returning the Gemini context cache still to delete"""
+        
+        task = self.cache_tasks.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+        self.cancel_history_summary(session_id)
+        self.session_last_used.pop(session_id, None)
+        self.session_models.pop(session_id, None)
+        self.session_cache_deadlines.pop(session_id, None)
+        self.session_prefixes.pop(session_id, None)
+        return self.session_caches.pop(session_id, None)
+    
+    async def _delete_context_caches(self, cached_contents: List[Any]):
+        """Delete Gemini context caches without blocking the event loop"""
+        
+        loop = asyncio.get_event_loop()
+        for cached_content in cached_contents:
+            if cached_content is None:
+                continue
+            try:
+                await loop.run_in_executor(None, cached_content.delete)
+            except Exception as e:
+                logger.warning(f"Could not delete Gemini context cache {cached_content.name}: {e}")
+    
+    async def release_session(self, session_id: str):
+        """Drop everything held for a finished session, including its Gemini context cache"""
+        await self._delete_context_caches([self._forget_session(session_id)])
+    
+    def _expire_idle_sessions(self):
+        """Release sessions idle for longer than the cache TTL, e.g. abandoned or disconnected ones"""
+        
+        cutoff = time.monotonic() - self.cache_ttl_minutes * 60
+        expired = [session_id for session_id, last_used in self.session_last_used.items() if last_used < cutoff]
+        if not expired:
+            return
+        
+        cached_contents = [self._forget_session(session_id) for session_id in expired]
+        if any(cached_content is not None for cached_content in cached_contents):
+            task = asyncio.create_task(self._delete_context_caches(cached_contents))
+            self.cleanup_tasks.add(task)
+            task.add_done_callback(self.cleanup_tasks.discard)
+        logger.info(f"Released {len(expired)} idle session(s) from the AI service")
+    
+    def schedule_history_summary(self, session: NegotiationSession):
+        """Refresh the session's rolling history summary in the background when it falls behind"""
+        
+        if not self.model or session.id in self.summary_tasks:
+            return
+        if len(session.messages) - session.summarized_up_to <= SUMMARY_REFRESH_MESSAGES:
+            return
+        
+        task = asyncio.create_task(self._refresh_history_summary(session))
+        self.summary_tasks[session.id] = task
+        task.add_done_callback(lambda _: self.summary_tasks.pop(session.id, None))
+    
+    async def _refresh_history_summary(self, session: NegotiationSession):
+        """Fold messages older than the verbatim window into the session summary"""
+        
+        summarize_up_to = len(session.messages) - SUMMARY_KEEP_RECENT_MESSAGES
+        conversation = "".join(
+            f"{'Seller' if msg.sender == 'seller' else 'Buyer'}: {msg.content}\n"
+            for msg in session.messages[session.summarized_up_to:summarize_up_to]
+        )
+        
+        try:
+            summary = await self._call_gemini_api(HISTORY_SUMMARY_PROMPT.format_map({
+                "previous_summary": session.history_summary or "None",
+                "conversation": conversation
+            }))
+        except Exception as e:
+            logger.warning(f"WARNING: History summary failed for session {session.id}: {e}")
+            return
+        
+        session.history_summary = summary
+        session.summarized_up_to = summarize_up_to
+    
+    def cancel_history_summary(self, session_id: str):
+        """Cancel a pending summarization for a session that has ended"""
+        task = self.summary_tasks.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+    
+    async def aclose(self):
+        """Release Gemini context caches and background work still held by active sessions"""
+        session_ids = set(self.session_prefixes) | set(self.session_caches) | set(self.summary_tasks) | set(self.cache_tasks)
+        for session_id in session_ids:
+            await self.release_session(session_id)
+    
     async def generate_response(
         self,
         approach,  # Can be string or NegotiationApproach enum
         target_price: int,
         max_budget: int,
         chat_history: List[ChatMessage],
-        product: Product
+        product: Product,
+        session_id: Optional[str] = None,
+        history_summary: str = "",
+        summarized_up_to: int = 0
     ) -> str:
         """Legacy method for backward compatibility"""
         
@@ -114,105 +555,259 @@ class GeminiOnlyService:
             except ValueError:
                 approach = NegotiationApproach.DIPLOMATIC  # Default fallback
         
+        # Closing and logistics turns already have a canned reply
+        short_circuit = self._get_short_circuit_response(approach, target_price, chat_history, product)
+        if short_circuit:
+            return short_circuit
+        
         if not self.model:
             return self._get_fallback_response(approach, target_price, chat_history, product)
         
         try:
-            # Build context for AI
-            context = self._build_negotiation_context(
-                approach, target_price, max_budget, chat_history, product
+            # Serve near-identical seller messages from the semantic cache
+            cache_key, embedding, cached_response = await self._lookup_semantic_cache(
+                approach, target_price, chat_history, product, session_id
+            )
+            if cached_response:
+                return cached_response
+            
+            model, context = self._prepare_gemini_call(
+                approach, target_price, max_budget, chat_history, product, session_id,
+                history_summary, summarized_up_to
             )
             
             # Generate response using Gemini
-            response = await self._call_gemini_api(context)
+            response = await self._call_gemini_api(context, model=model)
+            
+            self._cache_response(cache_key, embedding, response, session_id)
             return response
             
         except Exception as e:
             logger.error(f"Error generating AI response: {e}")
             return self._get_fallback_response(approach, target_price, chat_history, product)
     
+    async def stream_response(
+        self,
+        approach,  # Can be string or NegotiationApproach enum
+        target_price: int,
+        max_budget: int,
+        chat_history: List[ChatMessage],
+        product: Product,
+        session_id: Optional[str] = None,
+        history_summary: str = "",
+        summarized_up_to: int = 0
+    ) -> AsyncIterator[str]:
+        """Streaming variant of generate_response, yielding text as Gemini decodes it"""
+        
+        # Convert string to enum if needed
+        if isinstance(approach, str):
+            try:
+                approach = NegotiationApproach(approach.lower())
+            except ValueError:
+                approach = NegotiationApproach.DIPLOMATIC  # Default fallback
+        
+        # Closing and logistics turns already have a canned reply
+        short_circuit = self._get_short_circuit_response(approach, target_price, chat_history, product)
+        if short_circuit:
+            yield short_circuit
+            return
+        
+        if not self.model:
+            yield self._get_fallback_response(approach, target_price, chat_history, product)
+            return
+        
+        chunks = []
+        try:
+            cache_key, embedding, cached_response = await self._lookup_semantic_cache(
+                approach, target_price, chat_history, product, session_id
+            )
+            if cached_response:
+                yield cached_response
+                return
+            
+            model, context = self._prepare_gemini_call(
+                approach, target_price, max_budget, chat_history, product, session_id,
+                history_summary, summarized_up_to
+            )
+            
+            async for chunk in self._stream_gemini_api(context, model=model):
+                chunks.append(chunk)
+                yield chunk
+            
+            self._cache_response(cache_key, embedding, "".join(chunks).strip(), session_id)
+            
+        except Exception as e:
+            logger.error(f"Error streaming AI response: {e}")
+            # Only fall back if nothing has reached the seller yet
+            if not chunks:
+                yield self._get_fallback_response(approach, target_price, chat_history, product)
+    
+    def _get_short_circuit_response(
+        self,
+        approach: NegotiationApproach,
+        target_price: int,
+        chat_history: List[ChatMessage],
+        product: Product
+    ) -> Optional[str]:
+        """Canned reply for agreement/logistics turns, or None when Gemini is needed"""
+        
+        last_seller_message = next(
+            (msg.content for msg in reversed(chat_history) if msg.sender == "seller"), ""
+        )
+        category = _match_short_circuit_intent(last_seller_message)
+        if category is None:
+            return None
+        
+        logger.info(f"Short-circuited '{category}' seller message without a Gemini call")
+        return self._format_fallback_template(category, approach, target_price, product)
+    
+    async def _lookup_semantic_cache(
+        self,
+        approach: NegotiationApproach,
+        target_price: int,
+        chat_history: List[ChatMessage],
+        product: Product,
+        session_id: Optional[str] = None
+    ) -> Tuple[Any, Optional[Any], Optional[str]]:
+        """Embed the latest seller message and look it up in the semantic cache"""
+        
+        last_seller_message = next(
+            (msg.content for msg in reversed(chat_history) if msg.sender == "seller"), ""
+        )
+        cache_key = (approach.value, product.id, target_price)
+        
+        # Messages quoting figures embed alike whatever the number, so a cached reply would cite stale prices
+        if not self.semantic_cache or not last_seller_message or PRICE_FIGURE_PATTERN.search(last_seller_message):
+            return cache_key, None, None
+        
+        embedding = await self.semantic_cache.encode(last_seller_message)
+        # Skip the session's own earlier replies so repeated objections still get fresh concessions
+        cached_response = self.semantic_cache.search(
+            cache_key, embedding, threshold=self.semantic_cache_threshold, exclude_session=session_id
+        )
+        return cache_key, embedding, cached_response
+    
+    def _cache_response(self, cache_key: Any, embedding: Optional[Any], response: str, session_id: Optional[str]):
+        """Store a reply in the semantic cache unless it quotes a figure"""
+        
+        # A quoted offer reflects how far this session has conceded; replaying it elsewhere would skip
+        # the other session's concession ladder and reveal the ceiling
+        if embedding is None or PRICE_FIGURE_PATTERN.search(response):
+            return
+        self.semantic_cache.insert(cache_key, embedding, response, session_id=session_id)
+    
+    def _prepare_gemini_call(
+        self,
+        approach: NegotiationApproach,
+        target_price: int,
+        max_budget: int,
+        chat_history: List[ChatMessage],
+        product: Product,
+        session_id: Optional[str],
+        history_summary: str = "",
+        summarized_up_to: int = 0
+    ):
+        """Pick the model and prompt for a turn, using the session's context cache when present"""
+        
+        now = time.monotonic()
+        if session_id in self.session_last_used:
+            self.session_last_used[session_id] = now
+        
+        # Gemini deletes the context cache when its TTL runs out, so long sessions go back to the full prompt
+        deadline = self.session_cache_deadlines.get(session_id) if session_id else None
+        if deadline is not None and now >= deadline:
+            self.session_cache_deadlines.pop(session_id, None)
+            self.session_models.pop(session_id, None)
+            self.session_caches.pop(session_id, None)
+            logger.info(f"Gemini context cache of session {session_id} expired, sending the full prompt")
+        
+        model = self.session_models.get(session_id) if session_id else None
+        suffix = self._build_conversation_suffix(chat_history, history_summary, summarized_up_to)
+        
+        if model is not None:
+            # Static prefix lives in the Gemini cache, only send the conversation
+            return model, suffix
+        
+        # Reuse the prefix formatted when the session started, building it only for unknown sessions
+        prefix = self.session_prefixes.get(session_id) if session_id else None
+        if prefix is None:
+            prefix = self._build_prompt_prefix(approach, target_price, max_budget, product)
+        
+        return self.model, prefix + suffix
+    
     def _build_negotiation_context(
         self,
         approach: NegotiationApproach,
         target_price: int,
         max_budget: int,
         chat_history: List[ChatMessage],
-        product: Product
+        product: Product,
+        history_summary: str = "",
+        summarized_up_to: int = 0
     ) -> str:
         """Build context prompt for Gemini AI"""
         
-        # Get the latest seller message
-        seller_messages = [msg for msg in chat_history if msg.sender == "seller"]
-        last_seller_message = seller_messages[-1].content if seller_messages else ""
+        prefix = self._build_prompt_prefix(approach, target_price, max_budget, product)
+        suffix = self._build_conversation_suffix(chat_history, history_summary, summarized_up_to)
         
-        # Build conversation history
-        conversation_history = ""
-        for msg in chat_history[-6:]:  # Last 6 messages for context
-            sender_label = "Seller" if msg.sender == "seller" else "You (Buyer)"
-            conversation_history += f"{sender_label}: {msg.content}\n"
+        return prefix + suffix
+    
+    def _build_prompt_prefix(
+        self,
+        approach: NegotiationApproach,
+        target_price: int,
+        max_budget: int,
+        product: Product
+    ) -> str:
+        """Build the session-invariant part of the prompt (product, approach, instructions)"""
         
-        # Define approach strategies
-        approach_strategies = {
-            NegotiationApproach.ASSERTIVE: {
-                "style": "direct and confident",
-                "tactics": "Make firm offers, emphasize market research, be persistent but polite",
-                "personality": "business-like and decisive"
-            },
-            NegotiationApproach.DIPLOMATIC: {
-                "style": "balanced and respectful",
-                "tactics": "Find mutual benefits, acknowledge seller's position, propose win-win solutions",
-                "personality": "professional and understanding"
-            },
-            NegotiationApproach.CONSIDERATE: {
-                "style": "empathetic and budget-conscious",
-                "tactics": "Explain budget constraints, show genuine interest, be patient",
-                "personality": "humble and appreciative"
-            }
-        }
+        strategy = APPROACH_STRATEGIES.get(approach, APPROACH_STRATEGIES[NegotiationApproach.DIPLOMATIC])
         
-        strategy = approach_strategies.get(approach, approach_strategies[NegotiationApproach.DIPLOMATIC])
+        return PROMPT_PREFIX_TEMPLATE.format_map({
+            "title": product.title,
+            "price": product.price,
+            "target_price": target_price,
+            "max_budget": max_budget,
+            "condition": product.condition,
+            "seller_name": product.seller_name,
+            "location": product.location,
+            "approach": approach.value,
+            "approach_label": approach.value.upper(),
+            **strategy
+        })
+    
+    def _build_conversation_suffix(
+        self,
+        chat_history: List[ChatMessage],
+        history_summary: str = "",
+        summarized_up_to: int = 0
+    ) -> str:
+        """Build the per-turn part of the prompt (summary, recent conversation and latest seller message)"""
         
-        prompt = f"""
-You are an AI negotiation agent representing a buyer who wants to purchase: {product.title}
-
-PRODUCT DETAILS:
-- Current asking price: ₹{product.price:,}
-- Your target price: ₹{target_price:,}
-- Your maximum budget: ₹{max_budget:,}
-- Product condition: {product.condition}
-- Seller: {product.seller_name}
-- Location: {product.location}
-
-NEGOTIATION APPROACH: {approach.value.upper() if hasattr(approach, 'value') else str(approach).upper()}
-- Style: {strategy["style"]}
-- Tactics: {strategy["tactics"]}
-- Personality: {strategy["personality"]}
-
-CONVERSATION HISTORY:
-{conversation_history}
-
-LATEST SELLER MESSAGE: "{last_seller_message}"
-
-INSTRUCTIONS:
-1. Respond as a human buyer (never mention you're an AI)
-2. Use the {approach.value if hasattr(approach, 'value') else str(approach)} negotiation approach consistently
-3. Stay within your budget constraints (max ₹{max_budget:,})
-4. Work towards your target price of ₹{target_price:,}
-5. Keep responses conversational and natural (50-80 words)
-6. Include relevant details about pickup/payment when appropriate
-7. Be respectful but persistent in negotiations
-8. If the seller's price is too high, explain your position clearly
-9. If a good deal is reached, move towards closing (exchange contact details)
-
-CURRENT SITUATION ANALYSIS:
-- Current offer/price being discussed: Look at the conversation
-- Progress towards target: Calculate if you're getting closer
-- Seller's flexibility: Assess from their responses
-
-Generate your next response as the buyer:
-"""
+        # Verbatim window: every message the summary does not cover yet, so turns are never dropped
+        # while a refresh is in flight (at least the last few, capped if summarization keeps failing)
+        verbatim_count = min(
+            PROMPT_MAX_HISTORY_MESSAGES,
+            max(SUMMARY_KEEP_RECENT_MESSAGES, len(chat_history) - summarized_up_to)
+        )
         
-        return prompt
+        # Single backwards pass: recent conversation lines and the latest seller message
+        recent_lines = []
+        last_seller_message = None
+        for index, msg in enumerate(reversed(chat_history)):
+            if index < verbatim_count:
+                sender_label = "Seller" if msg.sender == "seller" else "You (Buyer)"
+                recent_lines.append(f"{sender_label}: {msg.content}\n")
+            elif last_seller_message is not None:
+                break
+            if last_seller_message is None and msg.sender == "seller":
+                last_seller_message = msg.content
+        
+        return PROMPT_SUFFIX_TEMPLATE.format_map({
+            "prior_summary": f"PRIOR SUMMARY: {history_summary}\n" if history_summary else "",
+            "conversation_history": "".join(reversed(recent_lines)),
+            "last_seller_message": last_seller_message or ""
+        })
     
     def _build_strategic_context(
         self,
@@ -321,36 +916,34 @@ Generate your strategic response as the buyer:
     def _build_tactics_description(self, tactics: List[NegotiationTactic]) -> str:
         """Build description of tactics to use"""
         
-        tactic_descriptions = {
-            NegotiationTactic.ANCHORING: "Anchor with market research and comparable prices",
-            NegotiationTactic.SCARCITY: "Mention time constraints or alternative options",
-            NegotiationTactic.BUNDLING: "Request additional value (accessories, delivery, warranty)",
-            NegotiationTactic.RECIPROCITY: "Show appreciation for seller's flexibility and respond in kind",
-            NegotiationTactic.SOCIAL_PROOF: "Reference what others are paying for similar items",
-            NegotiationTactic.URGENCY: "Express time sensitivity or immediate purchase capability",
-            NegotiationTactic.AUTHORITY: "Reference expert advice or professional recommendations",
-            NegotiationTactic.COMMITMENT: "Show readiness to close the deal immediately"
-        }
-        
         if not tactics:
             return "No specific tactics - focus on natural conversation and relationship building"
         
         descriptions = []
         for tactic in tactics:
-            desc = tactic_descriptions.get(tactic, f"Use {tactic.value} approach")
+            desc = TACTIC_DESCRIPTIONS.get(tactic, f"Use {tactic.value} approach")
             descriptions.append(f"- {desc}")
         
         return "\n".join(descriptions)
     
-    async def _call_gemini_api(self, prompt: str) -> str:
+    def _retrying(self) -> AsyncRetrying:
+        """Exponential backoff with jitter on Gemini 429 (quota) errors"""
+        return AsyncRetrying(
+            wait=wait_exponential_jitter(1, 16),
+            stop=stop_after_attempt(self.max_retries + 1),
+            retry=retry_if_exception_type(ResourceExhausted),
+            reraise=True
+        )
+    
+    async def _call_gemini_api(self, prompt: str, model=None) -> str:
         """Call Gemini API asynchronously"""
+        model = model or self.model
         try:
-            # Run the synchronous Gemini call in a thread pool
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None, 
-                lambda: self.model.generate_content(prompt)
-            )
+            async for attempt in self._retrying():
+                with attempt:
+                    # Native async call, no executor thread held for the request duration
+                    async with self._sem, self._bucket:
+                        response = await model.generate_content_async(prompt)
             
             return response.text.strip()
             
@@ -358,6 +951,25 @@ Generate your strategic response as the buyer:
             print(f"Gemini API error: {e}")
             raise
     
+    async def _stream_gemini_api(self, prompt: str, model=None) -> AsyncIterator[str]:
+        """Stream Gemini API output chunk by chunk"""
+        model = model or self.model
+        try:
+            # The slot is held until the stream is drained; only opening the stream is retried
+            async with self._sem:
+                async for attempt in self._retrying():
+                    with attempt:
+                        async with self._bucket:
+                            response = await model.generate_content_async(prompt, stream=True)
+                
+                async for chunk in response:
+                    if chunk.text:
+                        yield chunk.text
+                    
+        except Exception as e:
+            print(f"Gemini API error: {e}")
+            raise
+    
     def _get_fallback_response(
         self, 
         approach,  # Can be string or NegotiationApproach enum
@@ -399,125 +1011,26 @@ Generate your strategic response as the buyer:
     ) -> str:
         """Simplified keyword-based response system for fallback responses"""
         
-        message_lower = seller_message.lower()
-        
-        # Define keyword-based response mappings (simplified version)
-        keyword_responses = {
-            # Price is too low keywords
-            'price_low_keywords': ['low', 'too low', 'very low', 'not enough', 'insufficient', 'can\'t accept', 'won\'t work', 'no', 'cannot', 'firm', 'minimum'],
-            'price_low_responses': {
-                NegotiationApproach.ASSERTIVE: [
-                    f"I understand, but ₹{target_price:,} is based on market research. Let me stretch to ₹{int(target_price * 1.1):,} maximum.",
-                    f"Based on similar listings, ₹{target_price:,} is competitive. I can go up to ₹{int(target_price * 1.1):,} if needed.",
-                    f"Market data supports ₹{target_price:,}. My absolute maximum would be ₹{int(target_price * 1.1):,}."
-                ],
-                NegotiationApproach.DIPLOMATIC: [
-                    f"I appreciate your position. Could we perhaps meet at ₹{int(target_price * 1.1):,}? That would work for both of us.",
-                    f"Let's find middle ground. Would ₹{int(target_price * 1.1):,} be more acceptable?",
-                    f"I understand your concern. Could ₹{int(target_price * 1.1):,} bridge the gap between us?"
-                ],
-                NegotiationApproach.CONSIDERATE: [
-                    f"I really want this item. Could you please consider ₹{int(target_price * 1.1):,}? It would mean a lot to me.",
-                    f"I understand it might seem low. ₹{int(target_price * 1.1):,} is really stretching my budget.",
-                    f"Please help me out. ₹{int(target_price * 1.1):,} would be perfect if you could consider it."
-                ]
-            },
-            
-            # Seller is okay/agreeable keywords
-            'agreeable_keywords': ['ok', 'okay', 'fine', 'alright', 'sounds good', 'agreed', 'deal', 'accept', 'yes'],
-            'agreeable_responses': {
-                NegotiationApproach.ASSERTIVE: [
-                    "Excellent! Let's finalize this deal. When can we arrange pickup?",
-                    "Perfect! I'm ready to proceed. How should we handle payment?",
-                    "Great decision! Let's exchange contact details and complete this transaction."
-                ],
-                NegotiationApproach.DIPLOMATIC: [
-                    "Wonderful! I'm glad we could reach an agreement. How would you like to proceed?",
-                    "That's fantastic! Thank you for being flexible. What's the next step?",
-                    "Excellent! I appreciate your cooperation. Shall we arrange the pickup details?"
-                ],
-                NegotiationApproach.CONSIDERATE: [
-                    "Thank you so much! This really means a lot to me. How can we arrange the pickup?",
-                    "I'm so grateful we could work this out! When would be convenient for you?",
-                    "Thank you for understanding! I really appreciate your flexibility."
-                ]
-            },
-            
-            # Greeting keywords
-            'greeting_keywords': ['hi', 'hello', 'hey', 'good morning', 'good afternoon', 'available'],
-            'greeting_responses': {
-                NegotiationApproach.ASSERTIVE: [
-                    f"Hello {product.seller_name}! Yes, I'm very interested. I can offer ₹{target_price:,} for immediate purchase.",
-                    f"Hi there! I'm interested in your {product.title}. ₹{target_price:,} would work for me."
-                ],
-                NegotiationApproach.DIPLOMATIC: [
-                    f"Hello {product.seller_name}! Yes, I'm interested in your listing. Would ₹{target_price:,} work for you?",
-                    f"Hi! Your {product.title} looks great. Could we discuss ₹{target_price:,}?"
-                ],
-                NegotiationApproach.CONSIDERATE: [
-                    f"Hello {product.seller_name}! Yes, I'm interested. I hope ₹{target_price:,} might work?",
-                    f"Hi! I really love your {product.title}. Could ₹{target_price:,} be possible?"
-                ]
-            },
-            
-            # Price discussion keywords
-            'price_keywords': ['price', 'cost', 'amount', 'offer', 'budget'],
-            'price_responses': {
-                NegotiationApproach.ASSERTIVE: [
-                    f"Based on market research, ₹{target_price:,} is what I can offer. It's competitive and fair.",
-                    f"I've analyzed similar items - ₹{target_price:,} is a solid market price."
-                ],
-                NegotiationApproach.DIPLOMATIC: [
-                    f"I've been looking at similar items, and ₹{target_price:,} seems reasonable. What do you think?",
-                    f"Based on my research, ₹{target_price:,} appears fair for both of us."
-                ],
-                NegotiationApproach.CONSIDERATE: [
-                    f"I understand the value, but my budget is limited to ₹{target_price:,}. Is there any flexibility?",
-                    f"₹{target_price:,} is really what I can afford. I hope that might work?"
-                ]
-            },
-            
-            # Logistics keywords
-            'logistics_keywords': ['meet', 'pickup', 'delivery', 'when', 'where', 'payment'],
-            'logistics_responses': {
-                NegotiationApproach.ASSERTIVE: [
-                    "Perfect! I'm flexible with timing. I can arrange pickup today or tomorrow. Cash or online transfer?",
-                    "Excellent! I can come whenever convenient for you. What payment method do you prefer?"
-                ],
-                NegotiationApproach.DIPLOMATIC: [
-                    "Great! I'm available most times. When would work best for you? I can do cash or digital payment.",
-                    "Wonderful! I'm flexible with both timing and payment method. What works for you?"
-                ],
-                NegotiationApproach.CONSIDERATE: [
-                    "Thank you! I can work around your schedule. Whatever time and payment method you prefer.",
-                    "I appreciate it! I'm very flexible with pickup time and can pay however you'd like."
-                ]
-            }
-        }
+        category = _match_fallback_category(seller_message) or 'default'
+        return self._format_fallback_template(category, approach, target_price, product)
+    
+    def _format_fallback_template(
+        self,
+        category: str,
+        approach: NegotiationApproach,
+        target_price: int,
+        product: Product
+    ) -> str:
+        """Fill a random response template for the keyword category and approach"""
         
-        # Check for keyword matches and return appropriate response
-        for category in ['price_low', 'agreeable', 'greeting', 'price', 'logistics']:
-            keywords = keyword_responses[f'{category}_keywords']
-            if any(keyword in message_lower for keyword in keywords):
-                responses = keyword_responses[f'{category}_responses'][approach]
-                return random.choice(responses)
+        template = random.choice(FALLBACK_RESPONSE_TABLE[(category, approach)])
         
-        # Default fallback response when no keywords match
-        default_responses = {
-            NegotiationApproach.ASSERTIVE: [
-                f"Based on my research, ₹{target_price:,} is a fair market price for this item.",
-                f"I'm prepared to offer ₹{target_price:,} which aligns with current market values."
-            ],
-            NegotiationApproach.DIPLOMATIC: [
-                f"I'm hoping we can find a price that works for both of us, around ₹{target_price:,}.",
-                f"Could we explore ₹{target_price:,} as a fair solution?"
-            ],
-            NegotiationApproach.CONSIDERATE: [
-                f"I really hope we can work something out around ₹{target_price:,}.",
-                f"₹{target_price:,} would really fit my budget perfectly. I hope that might work?"
-            ]
-        }
-        return random.choice(default_responses[approach])
+        return template.format(
+            target_price=target_price,
+            stretch_price=int(target_price * 1.1),
+            seller_name=product.seller_name,
+            title=product.title
+        )
     
     def _get_enhanced_fallback_response(
         self, 
@@ -7,13 +7,13 @@ from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Back
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator
 from contextlib import asynccontextmanager
 from enum import Enum
 from pathlib import Path
-import json
+import orjson
 import asyncio
 import uuid
 from datetime import datetime
@@ -98,6 +98,15 @@ async def lifespan(app: FastAPI):
     # Startup
     global mcp_server
     await db.initialize()
+    db.start_flush_loop()
+    
+    # Load the semantic cache embedding model now rather than inside the first seller turn
+    if ai_service.semantic_cache:
+        try:
+            await ai_service.semantic_cache.warm_up()
+        except Exception as e:
+            logger.warning(f"Semantic cache embedding model failed to load, cache disabled: {e}")
+            ai_service.semantic_cache = None
     
     # Initialize MCP server
     try:
@@ -112,8 +121,11 @@ async def lifespan(app: FastAPI):
     logger.info("INFO: - Gemini Fallback: Available")
     logger.info("INFO: - Advanced Negotiation Tools: Market Analysis, Price Calculator, Strategy Advisor")
     yield
-    # Shutdown (if needed)
-    pass
+    # Shutdown
+    for session_data in list(session_manager.active_sessions.values()):
+        await cancel_pending_tasks(session_data)
+    await ai_service.aclose()
+    await db.stop_flush_loop()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -967,7 +979,7 @@ async def websocket_user_endpoint(websocket: WebSocket, session_id: str):
         while True:
             # Listen for user interventions
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = orjson.loads(data)
             
             if message_data.get('type') == 'manual_override':
                 await handle_user_override(session_id, message_data)
@@ -989,13 +1001,17 @@ async def websocket_seller_endpoint(websocket: WebSocket, session_id: str):
             # Listen for seller messages
             data = await websocket.receive_text()
             logger.info(f"[DEBUG] Seller WebSocket received data: {data}")
-            message_data = json.loads(data)
+            message_data = orjson.loads(data)
             logger.info(f"[DEBUG] Parsed message data: {message_data}")
             
             # Process seller message with advanced negotiation engine
             if message_data.get('type') == 'message':
                 logger.info(f"[DEBUG] Processing message type 'message' with content: {message_data.get('content', '')}")
-                await handle_advanced_seller_message(session_id, message_data.get('content', ''))
+                session_data = session_manager.active_sessions.get(session_id, {})
+                if session_data.get('legacy'):
+                    await handle_seller_message(session_id, message_data.get('content', ''))
+                else:
+                    await handle_advanced_seller_message(session_id, message_data.get('content', ''))
             else:
                 logger.warning(f"[DEBUG] Unknown message type: {message_data.get('type')}")
                 
@@ -1042,56 +1058,58 @@ async def handle_advanced_seller_message(session_id: str, seller_message: str):
         # Handle different result types
         if result.get('handoff_triggered'):
             # Human handoff required
-            await manager.send_to_user(session_id, {
-                "type": "handoff_required",
-                "trigger": result.get('trigger'),
-                "message": result.get('handoff_message'),
-                "contact_info": result.get('contact_info', {})
-            })
-            
-            await manager.send_to_seller(session_id, {
-                "type": "message",
-                "content": result.get('handoff_message'),
-                "sender": "buyer"
-            })
+            await asyncio.gather(
+                manager.send_to_user(session_id, {
+                    "type": "handoff_required",
+                    "trigger": result.get('trigger'),
+                    "message": result.get('handoff_message'),
+                    "contact_info": result.get('contact_info', {})
+                }),
+                manager.send_to_seller(session_id, {
+                    "type": "message",
+                    "content": result.get('handoff_message'),
+                    "sender": "buyer"
+                })
+            )
             
         elif result.get('session_completed'):
             # Session completed
-            await manager.send_to_user(session_id, {
-                "type": "session_completed",
-                "outcome": result.get('outcome'),
-                "final_price": result.get('final_price'),
-                "metrics": result.get('metrics', {}),
-                "summary": result.get('session_summary', {})
-            })
-            
-            await manager.send_to_seller(session_id, {
-                "type": "session_ended",
-                "message": "Negotiation completed. Thank you!"
-            })
+            await asyncio.gather(
+                manager.send_to_user(session_id, {
+                    "type": "session_completed",
+                    "outcome": result.get('outcome'),
+                    "final_price": result.get('final_price'),
+                    "metrics": result.get('metrics', {}),
+                    "summary": result.get('session_summary', {})
+                }),
+                manager.send_to_seller(session_id, {
+                    "type": "session_ended",
+                    "message": "Negotiation completed. Thank you!"
+                })
+            )
             
         else:
             # Normal AI response
             ai_response = result.get('ai_response', '')
             
-            # Send AI response to seller
-            await manager.send_to_seller(session_id, {
-                "type": "message",
-                "content": ai_response,
-                "sender": "buyer"
-            })
-            
-            # Send AI response and analysis to user
-            await manager.send_to_user(session_id, {
-                "type": "ai_response",
-                "message": ai_response,
-                "decision": result.get('decision', {}),
-                "tactics_used": result.get('tactics_used', []),
-                "phase": result.get('phase'),
-                "confidence": result.get('confidence', 0.5),
-                "seller_analysis": result.get('seller_analysis', {}),
-                "timestamp": datetime.now().isoformat()
-            })
+            # Send AI response to seller, and AI response with analysis to user
+            await asyncio.gather(
+                manager.send_to_seller(session_id, {
+                    "type": "message",
+                    "content": ai_response,
+                    "sender": "buyer"
+                }),
+                manager.send_to_user(session_id, {
+                    "type": "ai_response",
+                    "message": ai_response,
+                    "decision": result.get('decision', {}),
+                    "tactics_used": result.get('tactics_used', []),
+                    "phase": result.get('phase'),
+                    "confidence": result.get('confidence', 0.5),
+                    "seller_analysis": result.get('seller_analysis', {}),
+                    "timestamp": datetime.now().isoformat()
+                })
+            )
         
     except Exception as e:
         logger.error(f"Error handling seller message: {e}")
@@ -1103,6 +1121,151 @@ async def handle_advanced_seller_message(session_id: str, seller_message: str):
         })
 
 
+async def handle_seller_message(session_id: str, seller_message: str):
+    """Handle seller message for legacy sessions using the Gemini service directly"""
+    try:
+        session_data = session_manager.active_sessions.get(session_id)
+        if session_data is None:
+            logger.warning(f"Seller message for ended or unknown session {session_id} ignored")
+            await manager.send_to_seller(session_id, {
+                "type": "error",
+                "message": "This negotiation has ended."
+            })
+            return
+        
+        received_at = datetime.now()
+        
+        # Send seller message to user for monitoring
+        await manager.send_to_user(session_id, {
+            "type": "seller_message",
+            "message": seller_message,
+            "timestamp": received_at.isoformat()
+        })
+        
+        # The session may have ended while the frame was being forwarded; its tasks are already drained
+        if session_manager.active_sessions.get(session_id) is not session_data:
+            logger.warning(f"Session {session_id} ended before seller message could be processed")
+            return
+        
+        # Generate in the background so the receive loop can take the next frame;
+        # tasks are kept in arrival order so cancellation records messages in order too
+        task = asyncio.create_task(
+            generate_and_broadcast(session_id, session_data, seller_message, received_at)
+        )
+        pending_tasks = session_data.setdefault('pending_tasks', [])
+        pending_tasks.append(task)
+        task.add_done_callback(pending_tasks.remove)
+        
+    except Exception as e:
+        logger.error(f"Error handling legacy seller message: {e}")
+        
+        await manager.send_to_user(session_id, {
+            "type": "error",
+            "message": f"Error processing seller message: {str(e)}"
+        })
+
+
+async def generate_and_broadcast(
+    session_id: str,
+    session_data: Dict[str, Any],
+    seller_message: str,
+    received_at: datetime
+):
+    """Record a seller message and stream the AI reply to it, one exchange at a time per session"""
+    recorded = False
+    try:
+        # Recording under the lock keeps the transcript as seller message, reply, seller message, reply
+        async with session_data.setdefault('ai_lock', asyncio.Lock()):
+            await _record_seller_message(session_id, session_data, seller_message, received_at)
+            recorded = True
+            await _stream_ai_reply(session_id, session_data)
+    except asyncio.CancelledError:
+        # Session is ending: keep the seller message in the transcript even though it gets no reply
+        if not recorded:
+            await _record_seller_message(session_id, session_data, seller_message, received_at)
+        raise
+    except Exception as e:
+        logger.error(f"Error generating legacy AI response: {e}")
+        
+        await manager.send_to_user(session_id, {
+            "type": "error",
+            "message": f"Error processing seller message: {str(e)}"
+        })
+
+
+async def _record_seller_message(
+    session_id: str,
+    session_data: Dict[str, Any],
+    seller_message: str,
+    received_at: datetime
+):
+    """Append a seller message to the session and its log"""
+    session = session_data['session']
+    seller_msg = ChatMessage(
+        id=session.next_message_id(),
+        session_id=session_id,
+        sender="seller",
+        content=seller_message,
+        timestamp=received_at,
+        sender_type="human"
+    )
+    session.messages.append(seller_msg)
+    await db.append_message(seller_msg)
+
+
+async def _stream_ai_reply(session_id: str, session_data: Dict[str, Any]):
+    """Generate, stream and record one AI reply"""
+    session = session_data['session']
+    product = session_data['product']
+    params = session.user_params
+    
+    # Fold older turns into the rolling summary so the prompt stays bounded
+    ai_service.schedule_history_summary(session)
+    
+    # Forward the reply to the seller as Gemini decodes it
+    deltas = []
+    async for delta in ai_service.stream_response(
+        params.approach,
+        params.target_price,
+        params.max_budget,
+        session.messages,
+        product,
+        session_id=session_id,
+        history_summary=session.history_summary,
+        summarized_up_to=session.summarized_up_to
+    ):
+        deltas.append(delta)
+        await manager.send_to_seller(session_id, {
+            "type": "chunk",
+            "delta": delta
+        })
+    
+    ai_message = ChatMessage(
+        id=session.next_message_id(),
+        session_id=session_id,
+        sender="ai",
+        content="".join(deltas).strip(),
+        timestamp=datetime.now(),
+        sender_type="ai"
+    )
+    session.messages.append(ai_message)
+    session_data['performance_metrics']['messages_sent'] += 1
+    await db.append_message(ai_message)
+    
+    await asyncio.gather(
+        manager.send_to_seller(session_id, {
+            "type": "message_end",
+            "message": ai_message.to_dict()
+        }),
+        manager.send_to_user(session_id, {
+            "type": "ai_response",
+            "message": ai_message.content,
+            "timestamp": ai_message.timestamp.isoformat()
+        })
+    )
+
+
+
 async def handle_user_override(session_id: str, message_data: Dict[str, Any]):
     """Handle user manual override of AI response"""
     try:
@@ -1123,7 +1286,7 @@ async def handle_user_override(session_id: str, message_data: Dict[str, Any]):
         session = session_data['session']
         
         override_msg = ChatMessage(
-            id=str(uuid.uuid4()),
+            id=session.next_message_id(),
             session_id=session_id,
             sender="user",
             content=override_message,
@@ -1132,7 +1295,7 @@ async def handle_user_override(session_id: str, message_data: Dict[str, Any]):
         )
         
         session.messages.append(override_msg)
-        await db.save_session(session)
+        await db.append_message(override_msg)
         
         logger.info(f"User override in session {session_id}")
         
@@ -1140,18 +1303,28 @@ async def handle_user_override(session_id: str, message_data: Dict[str, Any]):
         logger.error(f"Error handling user override: {e}")
 
 
+async def cancel_pending_tasks(session_data: Dict[str, Any]):
+    """Cancel and drain a session's in-flight AI generation tasks"""
+    pending_tasks = list(session_data.get('pending_tasks', ()))
+    for task in pending_tasks:
+        task.cancel()
+    await asyncio.gather(*pending_tasks, return_exceptions=True)
+
+
 async def handle_session_end_request(session_id: str, message_data: Dict[str, Any]):
     """Handle user request to end session"""
     try:
-        if session_id not in session_manager.active_sessions:
+        # Remove from active sessions first so seller frames arriving while tasks drain are refused
+        session_data = session_manager.active_sessions.pop(session_id, None)
+        if session_data is None:
             return
         
         # End session with user-specified outcome
         outcome = message_data.get('outcome', 'user_cancelled')
         final_price = message_data.get('final_price')
         
-        session_data = session_manager.active_sessions[session_id]
         session = session_data['session']
+        await cancel_pending_tasks(session_data)
         
         session.status = "cancelled"
         session.outcome = outcome
@@ -1159,21 +1332,20 @@ async def handle_session_end_request(session_id: str, message_data: Dict[str, An
         session.ended_at = datetime.now()
         
         await db.save_session(session)
-        
-        # Remove from active sessions
-        del session_manager.active_sessions[session_id]
+        await ai_service.release_session(session_id)
         
         # Notify both parties
-        await manager.send_to_user(session_id, {
-            "type": "session_ended",
-            "outcome": outcome,
-            "message": "Session ended by user"
-        })
-        
-        await manager.send_to_seller(session_id, {
-            "type": "session_ended",
-            "message": "The buyer has ended the negotiation. Thank you for your time."
-        })
+        await asyncio.gather(
+            manager.send_to_user(session_id, {
+                "type": "session_ended",
+                "outcome": outcome,
+                "message": "Session ended by user"
+            }),
+            manager.send_to_seller(session_id, {
+                "type": "session_ended",
+                "message": "The buyer has ended the negotiation. Thank you for your time."
+            })
+        )
         
         logger.info(f"Session {session_id} ended by user request")
         
@@ -1232,15 +1404,24 @@ async def start_negotiation_legacy(params: NegotiationParams):
             'session': session,
             'product': product,
             'market_analysis': {},
-            'strategy': {'approach': params.approach.value},
+            'strategy': {'approach': params.approach.value if hasattr(params.approach, 'value') else params.approach},
             'phase': 'opening',
-            'performance_metrics': {'messages_sent': 0}
+            'performance_metrics': {'messages_sent': 0},
+            'legacy': True,
+            # Background AI replies, serialized per session by the lock
+            'ai_lock': asyncio.Lock(),
+            'pending_tasks': []
         }
         
         # Store in session manager
         session_manager.active_sessions[session_id] = session_data
         await db.save_session(session)
         
+        # Cache the static prompt prefix for the rest of the negotiation
+        ai_service.create_session_cache(
+            session_id, product, params.approach, params.target_price, params.max_budget
+        )
+        
         return {
             "session_id": session_id,
             "message": "Negotiation session started successfully",
@@ -1265,10 +1446,6 @@ async def get_session_details(session_id: str):
             # Ensure proper serialization of session and user_params
             session_dict = session.dict()
             
-            # Debug logging
-            logger.info(f"Session dict for {session_id}: {session_dict}")
-            logger.info(f"User params: {session_dict.get('user_params')}")
-            
             return {
                 "success": True,
                 "session": session_dict,
@@ -1294,6 +1471,34 @@ async def get_session_details(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _stream_session(session: NegotiationSession, status: str) -> AsyncIterator[bytes]:
+    """Yield session metadata as the first NDJSON line, then one line per message"""
+    messages = list(session.messages)
+    yield orjson.dumps({
+        "success": True,
+        "status": status,
+        "session": session.model_dump(exclude={'messages'}),
+        "message_count": len(messages)
+    }) + b"\n"
+    for message in messages:
+        yield orjson.dumps(message.to_dict()) + b"\n"
+
+
+@app.get("/api/sessions/{session_id}/stream")
+async def stream_session_details(session_id: str):
+    """Stream a session and its messages as NDJSON instead of one large JSON body"""
+    if session_id in session_manager.active_sessions:
+        session = session_manager.active_sessions[session_id]['session']
+        status = "active"
+    else:
+        session = await db.get_session(session_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        status = "completed"
+    
+    return StreamingResponse(_stream_session(session, status), media_type="application/x-ndjson")
+
+
 @app.get("/api/analytics/performance")
 async def get_performance_analytics():
     """Get overall system performance analytics"""
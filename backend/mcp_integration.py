@@ -730,7 +730,7 @@ class JSONContextManager:
                 session_id=session_id,
                 product=session_data.get("product", {}).dict() if session_data.get("product") else {},
                 market_analysis=session_data.get("market_analysis", {}),
-                chat_history=[msg.dict() for msg in session_data.get("session", {}).messages or []],
+                chat_history=[msg.to_dict() for msg in session_data.get("session", {}).messages or []],
                 seller_analysis=session_data.get("seller_analysis", {}),
                 negotiation_state=session_data.get("strategy", {}),
                 user_preferences=session_data.get("user_params", {}).dict() if session_data.get("user_params") else {},
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
+from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
 
@@ -47,7 +48,9 @@ class NegotiationParams(BaseModel):
         use_enum_values = True
 
 
-class ChatMessage(BaseModel):
+@dataclass(slots=True, frozen=True)
+class ChatMessage:
+    """Immutable chat message; a slotted dataclass since sessions hold hundreds of them in memory"""
     id: str
     session_id: str
     sender: str  # "user", "seller", "ai"
@@ -55,9 +58,15 @@ class ChatMessage(BaseModel):
     timestamp: datetime
     sender_type: str  # "human", "ai", "override"
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to a dict for WebSocket frames and storage (timestamp left for the encoder)"""
+        return {
+            "id": self.id,
+            "session_id": self.session_id,
+            "sender": self.sender,
+            "content": self.content,
+            "timestamp": self.timestamp,
+            "sender_type": self.sender_type
         }
 
 
@@ -71,6 +80,13 @@ class NegotiationSession(BaseModel):
     messages: List[ChatMessage] = []
     final_price: Optional[int] = None
     outcome: Optional[str] = None  # "success", "failed", "cancelled"
+    history_summary: str = ""  # Rolling summary of messages[:summarized_up_to]
+    summarized_up_to: int = 0
+    
+    def next_message_id(self) -> str:
+        """Short, monotonically increasing ID for the next message appended to this session"""
+        # Messages are append-only, so the count doubles as a per-session counter that survives reloads
+        return f"{self.id[:8]}-{len(self.messages):06x}"
     
     class Config:
         json_encoders = {
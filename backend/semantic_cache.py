@@ -0,0 +1,125 @@
+"""
+Semantic Response Cache
+Reuses AI responses for near-identical seller messages within the same negotiation context
+"""
+
+import asyncio
+import logging
+from typing import Dict, Hashable, List, Optional
+
+import numpy as np
+
+try:
+    import faiss
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError:
+    SEMANTIC_CACHE_AVAILABLE = False
+    logging.warning("faiss or sentence-transformers not available, semantic response cache disabled")
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Nearest neighbours checked per lookup, so entries from the asking session can be skipped
+SEARCH_CANDIDATES = 8
+
+# Partitions larger than this switch from float32 to 8-bit scalar-quantized storage
+QUANTIZE_MIN_ENTRIES = 256
+
+
+class SemanticCache:
+    """Nearest-neighbour cache of AI responses, partitioned by negotiation context key"""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, max_entries_per_key: int = 1000):
+        self.model_name = model_name
+        self.max_entries_per_key = max_entries_per_key
+        self.encoder = None
+        # Inner-product indexes over normalized embeddings, one per context key;
+        # flat float32 while small, 8-bit scalar-quantized once past QUANTIZE_MIN_ENTRIES
+        self.indexes: Dict[Hashable, "faiss.Index"] = {}
+        self.responses: Dict[Hashable, List[str]] = {}
+        # Session that produced each response, parallel to self.responses
+        self.sessions: Dict[Hashable, List[Optional[str]]] = {}
+
+    def _get_encoder(self) -> "SentenceTransformer":
+        """Load the embedding model on first use"""
+        if self.encoder is None:
+            self.encoder = SentenceTransformer(self.model_name)
+            logger.info(f"INFO: Loaded semantic cache embedding model {self.model_name}")
+        return self.encoder
+
+    async def warm_up(self):
+        """Load the embedding model ahead of the first lookup"""
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self._get_encoder)
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Embed text as a normalized float32 vector without blocking the event loop"""
+        loop = asyncio.get_event_loop()
+        embedding = await loop.run_in_executor(
+            None,
+            lambda: self._get_encoder().encode([text], normalize_embeddings=True)
+        )
+        return np.asarray(embedding, dtype=np.float32)
+
+    def search(
+        self,
+        key: Hashable,
+        embedding: np.ndarray,
+        threshold: float = 0.92,
+        exclude_session: Optional[str] = None
+    ) -> Optional[str]:
+        """Return the closest cached response passing the threshold, ignoring entries from exclude_session"""
+        index = self.indexes.get(key)
+        if index is None or index.ntotal == 0:
+            return None
+
+        scores, ids = index.search(embedding, min(index.ntotal, SEARCH_CANDIDATES))
+        for score, entry_id in zip(scores[0], ids[0]):
+            if entry_id < 0 or score < threshold:
+                break
+            if exclude_session is not None and self.sessions[key][entry_id] == exclude_session:
+                continue
+            logger.info(f"Semantic cache hit for {key} (similarity {score:.3f})")
+            return self.responses[key][entry_id]
+
+        return None
+
+    def insert(self, key: Hashable, embedding: np.ndarray, response: str, session_id: Optional[str] = None):
+        """Store a response under the context key"""
+        index = self.indexes.get(key)
+        if index is None:
+            index = faiss.IndexFlatIP(embedding.shape[1])
+            self.indexes[key] = index
+            self.responses[key] = []
+            self.sessions[key] = []
+
+        # Evict the oldest entry once the partition is full
+        if index.ntotal >= self.max_entries_per_key:
+            index.remove_ids(np.arange(1, dtype=np.int64))
+            self.responses[key].pop(0)
+            self.sessions[key].pop(0)
+
+        index.add(embedding)
+        self.responses[key].append(response)
+        self.sessions[key].append(session_id)
+
+        if isinstance(index, faiss.IndexFlatIP) and index.ntotal > QUANTIZE_MIN_ENTRIES:
+            self._quantize(key)
+
+    def _quantize(self, key: Hashable):
+        """Replace a partition's flat index with an 8-bit scalar-quantized one trained on its vectors"""
+        flat_index = self.indexes[key]
+        vectors = flat_index.reconstruct_n(0, flat_index.ntotal)
+
+        index = faiss.IndexScalarQuantizer(
+            flat_index.d, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(vectors)
+        index.add(vectors)
+        self.indexes[key] = index
+        logger.info(f"Quantized semantic cache partition {key} ({index.ntotal} entries)")
+
+    def __len__(self) -> int:
+        return sum(len(responses) for responses in self.responses.values())
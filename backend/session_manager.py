@@ -176,7 +176,7 @@ class AdvancedSessionManager:
             
             # Create opening message
             opening_message = ChatMessage(
-                id=str(uuid.uuid4()),
+                id=session.next_message_id(),
                 session_id=session_id,
                 sender="ai",
                 content=opening_result['response'],
@@ -188,8 +188,9 @@ class AdvancedSessionManager:
             session.messages.append(opening_message)
             session_data['performance_metrics']['messages_sent'] += 1
             
-            # Save session
-            await self.db.save_session(session)
+            # Log the message and queue the status change for the next batched write
+            await self.db.append_message(opening_message)
+            self.db.mark_dirty(session)
             
             logger.info(f"Negotiation started for session {session_id}")
             
@@ -224,7 +225,7 @@ class AdvancedSessionManager:
             
             # Create seller message
             seller_msg = ChatMessage(
-                id=str(uuid.uuid4()),
+                id=session.next_message_id(),
                 session_id=session_id,
                 sender="seller",
                 content=seller_message,
@@ -233,6 +234,7 @@ class AdvancedSessionManager:
             )
             
             session.messages.append(seller_msg)
+            await self.db.append_message(seller_msg)
             
             # Check for intervention triggers
             intervention = await self._check_intervention_triggers(session_data, seller_message)
@@ -265,7 +267,7 @@ class AdvancedSessionManager:
             
             # Create AI response message
             ai_message = ChatMessage(
-                id=str(uuid.uuid4()),
+                id=session.next_message_id(),
                 session_id=session_id,
                 sender="ai",
                 content=negotiation_result['response'],
@@ -275,6 +277,7 @@ class AdvancedSessionManager:
             
             session.messages.append(ai_message)
             session_data['performance_metrics']['messages_sent'] += 1
+            await self.db.append_message(ai_message)
             
             # Update session phase and metrics
             session_data['phase'] = negotiation_result.get('phase', 'exploration')
@@ -285,9 +288,6 @@ class AdvancedSessionManager:
             if completion_check:
                 return await self._complete_session(session_id, completion_check)
             
-            # Save session
-            await self.db.save_session(session)
-            
             return {
                 'ai_response': negotiation_result['response'],
                 'decision': negotiation_result.get('decision', {}),
@@ -534,7 +534,7 @@ class AdvancedSessionManager:
         
         # Create handoff message
         handoff_msg = ChatMessage(
-            id=str(uuid.uuid4()),
+            id=session.next_message_id(),
             session_id=session_id,
             sender="ai",
             content=handoff_message,
@@ -543,7 +543,8 @@ class AdvancedSessionManager:
         )
         
         session.messages.append(handoff_msg)
-        await self.db.save_session(session)
+        await self.db.append_message(handoff_msg)
+        self.db.mark_dirty(session)
         
         return {
             'handoff_triggered': True,
@@ -619,7 +620,7 @@ class AdvancedSessionManager:
             
             # Log error message
             error_msg = ChatMessage(
-                id=str(uuid.uuid4()),
+                id=session.next_message_id(),
                 session_id=session_id,
                 sender="system",
                 content=f"Session error: {error_message}",
@@ -1,18 +1,20 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, Optional
-import json
+from pydantic import BaseModel
+from typing import Dict, Optional, Any
+import orjson
 import asyncio
-from enum import Enum
-from datetime import datetime
 
-class CustomJSONEncoder(json.JSONEncoder):
-    """Custom JSON encoder to handle Enum and datetime objects"""
-    def default(self, obj):
-        if isinstance(obj, Enum):
-            return obj.value
-        elif isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
+
+def _orjson_default(obj: Any):
+    """Serialize types orjson does not handle natively (Enum and datetime are native)"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_message(message: dict) -> str:
+    """Encode a WebSocket payload as JSON text"""
+    return orjson.dumps(message, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS).decode()
 
 
 class ConnectionManager:
@@ -76,7 +78,7 @@ class ConnectionManager:
         if session_id in self.user_connections:
             try:
                 websocket = self.user_connections[session_id]
-                await websocket.send_text(json.dumps(message, cls=CustomJSONEncoder))
+                await websocket.send_text(dumps_message(message))
             except Exception as e:
                 print(f"Error sending message to user {session_id}: {e}")
                 self.disconnect_user(session_id)
@@ -86,15 +88,17 @@ class ConnectionManager:
         if session_id in self.seller_connections:
             try:
                 websocket = self.seller_connections[session_id]
-                await websocket.send_text(json.dumps(message, cls=CustomJSONEncoder))
+                await websocket.send_text(dumps_message(message))
             except Exception as e:
                 print(f"Error sending message to seller {session_id}: {e}")
                 self.disconnect_seller(session_id)
     
     async def broadcast_to_session(self, session_id: str, message: dict):
         """Send message to both user and seller in a session"""
-        await self.send_to_user(session_id, message)
-        await self.send_to_seller(session_id, message)
+        await asyncio.gather(
+            self.send_to_user(session_id, message),
+            self.send_to_seller(session_id, message)
+        )
     
     def is_user_connected(self, session_id: str) -> bool:
         """Check if user is connected to session"""
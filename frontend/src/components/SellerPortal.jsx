@@ -70,6 +70,31 @@ const SellerPortal = ({ user, onLogout }) => {
 
         wsRef.current.onmessage = (event) => {
           const data = JSON.parse(event.data)
+
+          // Streamed buyer reply: grow one bubble per chunk, finalize it on message_end
+          if (data.type === 'chunk' || data.type === 'message_end') {
+            const content = data.type === 'chunk' ? data.delta : data.message.content
+            setMessages(prev => {
+              const last = prev[prev.length - 1]
+              if (last && last.streaming) {
+                return [...prev.slice(0, -1), {
+                  ...last,
+                  content: data.type === 'chunk' ? last.content + content : content,
+                  streaming: data.type === 'chunk'
+                }]
+              }
+              return [...prev, {
+                id: Date.now(),
+                content,
+                sender: 'buyer',
+                timestamp: new Date(),
+                type: 'text',
+                streaming: data.type === 'chunk'
+              }]
+            })
+            return
+          }
+
           setMessages(prev => [...prev, {
             id: Date.now(),
             content: data.message,